@@ -1,3 +1,4 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 from typing import Optional
@@ -12,11 +13,66 @@ class Settings(BaseSettings):
     TAVUS_API_KEY: Optional[str] = None
     TAVUS_PERSONA_ID: Optional[str] = None
 
+    # Tavus upstream resilience
+    TAVUS_CONNECT_TIMEOUT: float = 3.0
+    TAVUS_READ_TIMEOUT: float = 10.0
+    TAVUS_DELETE_RETRIES: int = 2
+    TAVUS_BREAKER_ERROR_RATE: float = 0.5
+    TAVUS_BREAKER_MIN_CALLS: int = 5
+    TAVUS_BREAKER_WINDOW_SECONDS: float = 60.0
+    TAVUS_BREAKER_COOLDOWN_SECONDS: float = 30.0
+
     # JWT (optional - for future authentication)
     SECRET_KEY: str = "temp_secret_key_not_used"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Archival (오래된 세션 대화 내용 압축 보관)
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_INTERVAL_MINUTES: int = 360  # 0이면 비활성화
+    ARCHIVE_BATCH_SIZE: int = 100
+
+    # Idempotency / request coalescing
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    COALESCE_WINDOW_SECONDS: int = 5  # 0이면 비활성화
+
+    # Outbox (세션 종료 후처리)
+    # 세션 종료 시 진행도 갱신은 워커만 처리하므로 최소 1개 필요
+    OUTBOX_WORKERS: int = Field(2, ge=1)
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_LEASE_SECONDS: int = 60  # 선점한 이벤트를 다른 워커가 다시 가져가기까지의 시간
+    OUTBOX_RETENTION_HOURS: int = 24  # 처리 완료된 이벤트 보관 기간
+    OUTBOX_PURGE_INTERVAL_MINUTES: int = 30
+
+    # Rate limiting
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_IDLE_SECONDS: float = 600.0
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # 설정 시 워커 간 버킷 공유 (redis 패키지 필요)
+    # 앱 앞에 있는 리버스 프록시 수 (Railway는 1). 설정하지 않으면 모든 사용자가
+    # 프록시 주소 하나로 집계되므로 배포 시 반드시 지정 (Dockerfile에서 1로 설정)
+    TRUSTED_PROXY_HOPS: int = 0
+    # 또는 X-Forwarded-For를 신뢰할 프록시 주소 (쉼표 구분)
+    TRUSTED_PROXIES: str = ""
+
+    # Admin / profiling
+    ADMIN_TOKEN: Optional[str] = None  # 설정하지 않으면 /admin 엔드포인트 비활성화
+    PROFILING_ENABLED: bool = True
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_TOKEN_TTL_SECONDS: int = 600
+    PROFILE_SIGNING_KEY: Optional[str] = None  # 없으면 ADMIN_TOKEN으로 서명
+
+    # Entity cache (in-process LRU)
+    CACHE_TTL_SECONDS: float = 60.0
+    CACHE_NEGATIVE_TTL_SECONDS: float = 15.0
+    CACHE_MAX_ENTRIES: int = 10000
+    # 세션 캐시는 전체 대화 내용을 담으므로 훨씬 작게 유지
+    SESSION_CACHE_MAX_ENTRIES: int = 200
+
+    # Cohort rankings
+    COHORT_REBUILD_MINUTES: int = 60
+
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
 
@@ -1,9 +1,13 @@
 from prisma import Prisma
-from typing import Optional
+from contextvars import ContextVar
+from typing import Callable, Optional
 
 # Prisma client instance
 db: Optional[Prisma] = None
 
+# Per-request client wrapper (set by the profiler to trace queries)
+db_wrapper: ContextVar[Optional[Callable[[Prisma], Prisma]]] = ContextVar("db_wrapper", default=None)
+
 
 async def connect_db():
     """Connect to the database"""
@@ -25,4 +29,7 @@ def get_db() -> Prisma:
     """Get database instance"""
     if db is None:
         raise Exception("Database not connected")
+    wrapper = db_wrapper.get()
+    if wrapper is not None:
+        return wrapper(db)
     return db
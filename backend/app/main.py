@@ -1,10 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
 from app.config import get_settings
 from app.database import connect_db, disconnect_db
-from app.routers import conversation, user, progress, avatar_session
+from app.routers import conversation, user, progress, avatar_session, admin
+from app.routers.avatar_session import tavus_breaker
+from app.services.archive import run_archiver
+from app.services import outbox
+from app.services.rate_limit import RateLimitMiddleware, DEFAULT_RULES
+from app.services.profiling import ProfilingMiddleware
+from app.services.cache import cache_stats
+from app.services.cohort_stats import run_cohort_rebuilder
 
 settings = get_settings()
 
@@ -13,8 +21,17 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     # Startup
     await connect_db()
+    archiver_task = None
+    if settings.ARCHIVE_INTERVAL_MINUTES > 0:
+        archiver_task = asyncio.create_task(run_archiver())
+    outbox_workers = outbox.start_workers()
+    cohort_task = asyncio.create_task(run_cohort_rebuilder())
     yield
     # Shutdown
+    if archiver_task:
+        archiver_task.cancel()
+    cohort_task.cancel()
+    await outbox.stop_workers(outbox_workers)
     await disconnect_db()
 
 
@@ -25,6 +42,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Opt-in per-request profiling (X-Profile-Token header or admin-armed paths)
+app.add_middleware(ProfilingMiddleware)
+
+# Rate limiting (CORS보다 안쪽에 두어 429 응답에도 CORS 헤더가 붙도록 함)
+app.add_middleware(RateLimitMiddleware, rules=DEFAULT_RULES)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +62,7 @@ app.include_router(user.router, prefix="/api/users", tags=["Users"])
 app.include_router(conversation.router, prefix="/api/conversations", tags=["Conversations"])
 app.include_router(progress.router, prefix="/api/progress", tags=["Progress"])
 app.include_router(avatar_session.router, prefix="/api/avatar-sessions", tags=["Avatar Sessions"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -52,7 +76,24 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    tavus = tavus_breaker.snapshot()
+    return {
+        "status": "healthy" if tavus["state"] == "closed" else "degraded",
+        "upstreams": {
+            "tavus": tavus
+        }
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """런타임 지표 (서킷 브레이커 등)"""
+    return {
+        "circuit_breakers": {
+            "tavus": tavus_breaker.snapshot()
+        },
+        "caches": cache_stats()
+    }
     
 @app.get("/debug/env")
 async def check_env():
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Depends, Header
+from typing import Optional
+import hmac
+
+from app.config import get_settings
+from app.services.profiling import profile_store, create_token
+
+router = APIRouter()
+settings = get_settings()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """ADMIN_TOKEN이 설정된 경우에만 관리자 엔드포인트 허용"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.post("/profiling/token", dependencies=[Depends(require_admin)])
+async def create_profiling_token(ttl: Optional[int] = None):
+    """Issue a signed token; send it as X-Profile-Token to profile a request"""
+    token = create_token(ttl)
+
+    if not token:
+        raise HTTPException(status_code=503, detail="Profiling signing key not configured")
+
+    return {
+        "header": "X-Profile-Token",
+        "token": token,
+        "expires_in": ttl or settings.PROFILE_TOKEN_TTL_SECONDS
+    }
+
+
+@router.post("/profiling/arm", dependencies=[Depends(require_admin)])
+async def arm_profiling(path_prefix: str, count: int = 1):
+    """Profile the next `count` requests whose path starts with path_prefix"""
+    profile_store.arm(path_prefix, count)
+    return {"armed": profile_store.armed()}
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List recent request profiles"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Get a full profile report"""
+    report = profile_store.get(profile_id)
+
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return report
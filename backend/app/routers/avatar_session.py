@@ -1,14 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import Optional
 import httpx
 import os
 
 from app.config import get_settings
+from app.services.idempotency import idempotent, single_flight
+from app.services.rate_limit import client_ip
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    UpstreamError,
+    retry_with_jitter,
+)
 
 router = APIRouter()
 settings = get_settings()
 
+TAVUS_API_URL = "https://tavusapi.com/v2"
+
+# Tavus 장애 시 빠르게 실패하도록 하는 서킷 브레이커
+tavus_breaker = CircuitBreaker(
+    "tavus",
+    error_rate=settings.TAVUS_BREAKER_ERROR_RATE,
+    min_calls=settings.TAVUS_BREAKER_MIN_CALLS,
+    window_seconds=settings.TAVUS_BREAKER_WINDOW_SECONDS,
+    cooldown_seconds=settings.TAVUS_BREAKER_COOLDOWN_SECONDS,
+)
+
 def get_tavus_api_key() -> Optional[str]:
     """환경 변수에서 직접 읽기 (Railway 대응)"""
     return os.getenv("TAVUS_API_KEY") or settings.TAVUS_API_KEY
@@ -18,8 +37,57 @@ def get_tavus_persona_id() -> Optional[str]:
     return os.getenv("TAVUS_PERSONA_ID") or settings.TAVUS_PERSONA_ID
 
 
+async def tavus_request(method: str, path: str, retries: int = 0, **kwargs) -> httpx.Response:
+    """
+    Send a request to the Tavus API through the circuit breaker
+
+    5xx/429 responses, timeouts and connection errors count as failures and
+    raise; other responses are returned to the caller. With retries > 0
+    (idempotent requests only) transient failures are retried with jitter,
+    and the whole attempt counts as a single breaker outcome.
+    """
+    timeout = httpx.Timeout(
+        settings.TAVUS_READ_TIMEOUT,
+        connect=settings.TAVUS_CONNECT_TIMEOUT
+    )
+
+    async def send() -> httpx.Response:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.request(method, f"{TAVUS_API_URL}{path}", **kwargs)
+        if response.status_code >= 500 or response.status_code == 429:
+            raise UpstreamError(response.status_code, response.text)
+        return response
+
+    async def send_with_retries() -> httpx.Response:
+        return await retry_with_jitter(
+            send,
+            retries=retries,
+            retry_on=(UpstreamError, httpx.TransportError)
+        )
+
+    return await tavus_breaker.call(send_with_retries)
+
+
+def tavus_http_exception(e: Exception) -> HTTPException:
+    """Map upstream failures to a client-facing HTTP error"""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="Tavus is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(max(1, int(e.retry_after + 0.5)))}
+        )
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail="Tavus API timed out")
+    if isinstance(e, UpstreamError):
+        return HTTPException(status_code=502, detail=f"Tavus API error: {e.detail}")
+    if isinstance(e, httpx.TransportError):
+        return HTTPException(status_code=502, detail=f"Tavus API unreachable: {e}")
+    return HTTPException(status_code=500, detail=str(e))
+
+
 class SessionRequest(BaseModel):
     user_id: Optional[str] = None
+    session_id: Optional[str] = None  # 학습 세션 id (user_id가 없을 때 중복 요청 병합에 사용)
 
 
 class SessionResponse(BaseModel):
@@ -29,12 +97,20 @@ class SessionResponse(BaseModel):
 
 
 @router.post("/create", response_model=SessionResponse)
-async def create_avatar_session(request: SessionRequest):
+async def create_avatar_session(
+    request: SessionRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Create a real-time avatar conversation session with Tavus
 
     Returns a Daily.co room URL where the user can have a voice conversation
     with an AI English teacher that provides real-time corrections
+
+    Retries with the same Idempotency-Key (or repeated requests from the same
+    user, or the same client and learning session, within a short window)
+    share one Tavus conversation.
     """
     tavus_api_key = get_tavus_api_key()
     tavus_persona_id = get_tavus_persona_id()
@@ -44,11 +120,26 @@ async def create_avatar_session(request: SessionRequest):
             status_code=500,
             detail="Tavus API credentials not configured. Please set TAVUS_API_KEY and TAVUS_PERSONA_ID environment variables."
         )
+    ip = client_ip(http_request.scope)
+    coalesce_key = request.user_id
+    if not coalesce_key and request.session_id:
+        # 익명 요청은 클라이언트 주소 + 학습 세션으로 구분 (같은 NAT의 다른 사용자와 섞이지 않도록)
+        coalesce_key = f"{ip}:{request.session_id}"
+
     try:
-        return await create_tavus_session()
+        return await idempotent(
+            "avatar-session",
+            create_tavus_session,
+            caller=f"user:{request.user_id}" if request.user_id else f"ip:{ip}",
+            idempotency_key=idempotency_key,
+            coalesce_key=coalesce_key,
+            payload=request
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error creating avatar session: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise tavus_http_exception(e)
 
 
 async def create_tavus_session() -> SessionResponse:
@@ -62,19 +153,19 @@ async def create_tavus_session() -> SessionResponse:
             detail="Tavus API credentials not configured."
         )
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://tavusapi.com/v2/conversations",
-            headers={
-                "x-api-key": tavus_api_key,
-                "Content-Type": "application/json"
-            },
-            json={
-                "persona_id": tavus_persona_id,
-                "conversation_name": "English Correction Session",
-                "audio_only": False,  # Show Tavus AI video avatar
-                "custom_greeting": """Hi! I'm your English teacher. What would you like to talk about today?""",
-                "conversational_context": """You are a professional English conversation teacher with expertise in ESL (English as a Second Language). Your primary goal is to help korean students improve their English through active correction and practice.
+    response = await tavus_request(
+        "POST",
+        "/conversations",
+        headers={
+            "x-api-key": tavus_api_key,
+            "Content-Type": "application/json"
+        },
+        json={
+            "persona_id": tavus_persona_id,
+            "conversation_name": "English Correction Session",
+            "audio_only": False,  # Show Tavus AI video avatar
+            "custom_greeting": """Hi! I'm your English teacher. What would you like to talk about today?""",
+            "conversational_context": """You are a professional English conversation teacher with expertise in ESL (English as a Second Language). Your primary goal is to help korean students improve their English through active correction and practice.
 
 YOUR TEACHING METHOD:
 1. Listen carefully to everything the student says
@@ -107,30 +198,29 @@ YOUR PERSONALITY:
 - Professional but friendly
 
 Keep your explanations concise but thorough. Always prioritize correction over conversation flow - it's more important that they learn the right way than that the conversation feels smooth.""",
-                "properties": {
-                    "max_call_duration": 120,  # 1 minute (모바일 최적화)
-                    "enable_recording": False,  # Privacy
-                    "enable_closed_captions": True,  # Helps learning
-                    "language": "english",  # Full language name, not ISO code
-                    "participant_left_timeout": 60,
-                    "participant_absent_timeout": 300
-                }
-            },
-            timeout=30.0
-        )
+            "properties": {
+                "max_call_duration": 120,  # 1 minute (모바일 최적화)
+                "enable_recording": False,  # Privacy
+                "enable_closed_captions": True,  # Helps learning
+                "language": "english",  # Full language name, not ISO code
+                "participant_left_timeout": 60,
+                "participant_absent_timeout": 300
+            }
+        }
+    )
 
-        if response.status_code == 200:
-            data = response.json()
-            return SessionResponse(
-                session_id=data["conversation_id"],
-                room_url=data["conversation_url"],
-                provider="tavus"
-            )
-        else:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Tavus API error: {response.text}"
-            )
+    if response.status_code == 200:
+        data = response.json()
+        return SessionResponse(
+            session_id=data["conversation_id"],
+            room_url=data["conversation_url"],
+            provider="tavus"
+        )
+    else:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Tavus API error: {response.text}"
+        )
 
 
 @router.delete("/tavus/{conversation_id}")
@@ -146,25 +236,27 @@ async def delete_tavus_session(conversation_id: str):
             status_code=500,
             detail="Tavus API credentials not configured. Please set TAVUS_API_KEY environment variable."
         )
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"https://tavusapi.com/v2/conversations/{conversation_id}",
-                headers={
-                    "x-api-key": tavus_api_key
-                },
-                timeout=30.0
-            )
-
-            if response.status_code in [200, 204]:
-                return {"success": True, "message": f"Conversation {conversation_id} deleted"}
-            else:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Tavus API error: {response.text}"
-                )
+        # DELETE는 멱등이므로 일시적 장애 시 재시도 (브레이커에는 한 번의 결과로 기록)
+        response = await tavus_request(
+            "DELETE",
+            f"/conversations/{conversation_id}",
+            retries=settings.TAVUS_DELETE_RETRIES,
+            headers={
+                "x-api-key": tavus_api_key
+            }
+        )
     except Exception as e:
         print(f"Error deleting Tavus session: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise tavus_http_exception(e)
 
+    if response.status_code in [200, 204]:
+        # 삭제된 대화가 병합된 결과로 다시 반환되지 않도록 제거
+        single_flight.discard(lambda result: getattr(result, "session_id", None) == conversation_id)
+        return {"success": True, "message": f"Conversation {conversation_id} deleted"}
 
+    raise HTTPException(
+        status_code=response.status_code,
+        detail=f"Tavus API error: {response.text}"
+    )
@@ -1,21 +1,41 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
 from app.models import SessionCreate, SessionResponse
 from app.database import get_db
+from app.services.archive import rehydrate_session, load_archives
+from app.services.idempotency import idempotent
+from app.services.cache import user_cache, progress_cache, session_cache
+from app.services.cohort_stats import cohort_stats
+from app.services import outbox
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 
 @router.post("/sessions", response_model=SessionResponse)
-async def create_session(session: SessionCreate):
+async def create_session(
+    session: SessionCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create a new learning session"""
+    return await idempotent(
+        "create-session",
+        lambda: _create_session(session),
+        caller=f"user:{session.user_id}",
+        idempotency_key=idempotency_key,
+        coalesce_key=session.user_id,
+        payload=session
+    )
+
+
+async def _create_session(session: SessionCreate):
     try:
         db = get_db()
 
         # Verify user exists
-        user = await db.user.find_unique(
-            where={"id": session.user_id}
+        user = await user_cache.get_or_load(
+            session.user_id,
+            lambda: db.user.find_unique(where={"id": session.user_id})
         )
 
         if not user:
@@ -32,6 +52,9 @@ async def create_session(session: SessionCreate):
             }
         )
 
+        # 새 id에 대한 negative 캐시 항목 제거
+        session_cache.invalidate(new_session.id)
+
         return new_session
 
     except HTTPException:
@@ -61,17 +84,30 @@ async def end_session(session_id: str):
         # Calculate duration
         duration = int((datetime.now() - session.startedAt).total_seconds())
 
-        # Update session
-        updated_session = await db.session.update(
-            where={"id": session_id},
-            data={
-                "endedAt": datetime.now(),
-                "duration": duration
-            }
-        )
+        # Update session and record side effects in the same transaction
+        async with db.tx() as tx:
+            # 동시에 종료 요청이 와도 한 번만 종료되도록 조건부 업데이트
+            ended = await tx.session.update_many(
+                where={"id": session_id, "endedAt": None},
+                data={
+                    "endedAt": datetime.now(),
+                    "duration": duration
+                }
+            )
+
+            if ended != 1:
+                raise HTTPException(status_code=400, detail="Session already ended")
+
+            updated_session = await tx.session.find_unique(
+                where={"id": session_id}
+            )
 
-        # Update user progress
-        await update_user_progress(session.userId, session_id)
+            payload = {"user_id": session.userId, "session_id": session_id}
+            await outbox.enqueue(tx, "progress.update", payload)
+
+        # Progress etc. are applied by the outbox workers
+        session_cache.invalidate(session_id)
+        outbox.notify()
 
         return updated_session
 
@@ -88,12 +124,21 @@ async def get_session(session_id: str):
     try:
         db = get_db()
 
-        session = await db.session.find_unique(
-            where={"id": session_id},
-            include={
-                "conversations": True,
-                "corrections": True
-            }
+        async def load_session():
+            session = await db.session.find_unique(
+                where={"id": session_id},
+                include={
+                    "conversations": True,
+                    "corrections": True
+                }
+            )
+            return await rehydrate_session(session)
+
+        # 종료된 세션만 캐시 (진행 중인 세션은 내용이 바뀔 수 있음)
+        session = await session_cache.get_or_load(
+            session_id,
+            load_session,
+            should_cache=lambda s: s.endedAt is not None
         )
 
         if not session:
@@ -119,6 +164,11 @@ async def get_session_conversations(session_id: str):
             order={"timestamp": "asc"}
         )
 
+        if not conversations:
+            archived = await load_archives([session_id])
+            if session_id in archived:
+                return archived[session_id]["conversations"]
+
         return conversations
 
     except Exception as e:
@@ -137,6 +187,11 @@ async def get_session_corrections(session_id: str):
             order={"createdAt": "asc"}
         )
 
+        if not corrections:
+            archived = await load_archives([session_id])
+            if session_id in archived:
+                return archived[session_id]["corrections"]
+
         return corrections
 
     except Exception as e:
@@ -144,49 +199,55 @@ async def get_session_corrections(session_id: str):
         raise HTTPException(status_code=500, detail="Failed to get corrections")
 
 
-async def update_user_progress(user_id: str, session_id: str):
-    """Update user's overall progress after session ends"""
-    try:
-        db = get_db()
-
-        # Get session data
-        session = await db.session.find_unique(
-            where={"id": session_id},
-            include={
-                "corrections": True
-            }
-        )
-
-        if not session:
-            return
+@outbox.handler("progress.update")
+async def handle_progress_update(tx, payload: dict):
+    user_id = payload["user_id"]
+    progress = await update_user_progress(user_id, payload["session_id"], client=tx)
 
-        # Get user progress
-        progress = await db.progress.find_unique(
-            where={"userId": user_id}
-        )
+    def after_commit():
+        progress_cache.invalidate(user_id)
+        cohort_stats.observe(progress)
 
-        if not progress:
-            # Create progress if doesn't exist
-            progress = await db.progress.create(
-                data={"userId": user_id}
-            )
+    return after_commit
 
-        # Calculate correction counts by type
-        corrections = session.corrections
-        grammar_count = sum(1 for c in corrections if c.correctionType == "grammar")
-        pronunciation_count = sum(1 for c in corrections if c.correctionType == "pronunciation")
-        vocabulary_count = sum(1 for c in corrections if c.correctionType == "vocabulary")
 
-        # Update progress
-        await db.progress.update(
-            where={"userId": user_id},
-            data={
-                "totalSessions": progress.totalSessions + 1,
-                "totalDuration": progress.totalDuration + (session.duration or 0),
-                "totalCorrections": progress.totalCorrections + len(corrections),
+async def update_user_progress(user_id: str, session_id: str, client=None):
+    """Update user's overall progress after session ends"""
+    db = client or get_db()
+
+    # Get session data
+    session = await db.session.find_unique(
+        where={"id": session_id},
+        include={
+            "corrections": True
+        }
+    )
+
+    if not session:
+        return
+
+    # Calculate correction counts by type
+    corrections = session.corrections
+    grammar_count = sum(1 for c in corrections if c.correctionType == "grammar")
+    pronunciation_count = sum(1 for c in corrections if c.correctionType == "pronunciation")
+    vocabulary_count = sum(1 for c in corrections if c.correctionType == "vocabulary")
+
+    # Update progress atomically (workers may handle the same user concurrently)
+    return await db.progress.upsert(
+        where={"userId": user_id},
+        data={
+            "create": {
+                "userId": user_id,
+                "totalSessions": 1,
+                "totalDuration": session.duration or 0,
+                "totalCorrections": len(corrections),
+                "lastSessionDate": datetime.now()
+            },
+            "update": {
+                "totalSessions": {"increment": 1},
+                "totalDuration": {"increment": session.duration or 0},
+                "totalCorrections": {"increment": len(corrections)},
                 "lastSessionDate": datetime.now()
             }
-        )
-
-    except Exception as e:
-        print(f"Error updating progress: {e}")
+        }
+    )
@@ -1,25 +1,39 @@
 from fastapi import APIRouter, HTTPException
+from typing import Optional
 from app.models import ProgressResponse
 from app.database import get_db
+from app.services.mistake_clusters import mistake_cluster_engine
+from app.services.archive import rehydrate_sessions, get_archived_counts, load_archived_corrections
+from app.services.cache import progress_cache
+from app.services.cohort_stats import cohort_stats, COHORTS, ALL_COHORT
 
 router = APIRouter()
 
 
+async def find_progress(user_id: str):
+    """Read-through lookup of a user's progress row (None if missing, never cached)"""
+    db = get_db()
+    return await progress_cache.get_or_load(
+        user_id,
+        lambda: db.progress.find_unique(where={"userId": user_id})
+    )
+
+
 @router.get("/{user_id}", response_model=ProgressResponse)
 async def get_user_progress(user_id: str):
     """Get user's learning progress"""
     try:
         db = get_db()
 
-        progress = await db.progress.find_unique(
-            where={"userId": user_id}
-        )
+        progress = await find_progress(user_id)
 
         if not progress:
             # Create progress record if doesn't exist
             progress = await db.progress.create(
                 data={"userId": user_id}
             )
+            progress_cache.set(user_id, progress)
+            cohort_stats.observe(progress)
 
         return progress
 
@@ -35,9 +49,7 @@ async def get_user_stats(user_id: str):
         db = get_db()
 
         # Get progress
-        progress = await db.progress.find_unique(
-            where={"userId": user_id}
-        )
+        progress = await find_progress(user_id)
 
         if not progress:
             raise HTTPException(status_code=404, detail="Progress not found")
@@ -57,7 +69,7 @@ async def get_user_stats(user_id: str):
 
         return {
             "progress": progress,
-            "recent_sessions": recent_sessions,
+            "recent_sessions": await rehydrate_sessions(recent_sessions),
             "average_session_duration": avg_duration,
             "total_conversations": await get_total_conversations(user_id)
         }
@@ -93,25 +105,32 @@ async def get_user_weaknesses(user_id: str):
         pronunciation_errors = [c for c in corrections if c.correctionType == "pronunciation"]
         vocabulary_errors = [c for c in corrections if c.correctionType == "vocabulary"]
 
-        # Find most common mistakes
-        common_grammar_mistakes = {}
-        for correction in grammar_errors[:20]:  # Last 20 grammar errors
-            key = correction.originalText.lower()
-            common_grammar_mistakes[key] = common_grammar_mistakes.get(key, 0) + 1
+        # Archived sessions keep only summary counts
+        archived_counts = await get_archived_counts(user_id)
+
+        # Top up recent corrections from the archive when few are live
+        recent_corrections = corrections[:10]
+        if len(recent_corrections) < 10 and archived_counts["corrections"] > 0:
+            archived = await load_archived_corrections(user_id, max_sessions=10)
+            recent_corrections = (recent_corrections + archived)[:10]
+
+        # Find most common mistakes (similar corrections grouped together)
+        grammar_clusters = await mistake_cluster_engine.top_clusters(
+            user_id, limit=5, correction_type="grammar"
+        )
 
         return {
             "weakness_areas": {
-                "grammar": len(grammar_errors),
-                "pronunciation": len(pronunciation_errors),
-                "vocabulary": len(vocabulary_errors)
+                "grammar": len(grammar_errors) + archived_counts["grammar"],
+                "pronunciation": len(pronunciation_errors) + archived_counts["pronunciation"],
+                "vocabulary": len(vocabulary_errors) + archived_counts["vocabulary"]
             },
-            "common_mistakes": sorted(
-                common_grammar_mistakes.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:5],
-            "recent_corrections": corrections[:10],
-            "improvement_suggestions": generate_suggestions(corrections)
+            "common_mistakes": [
+                (cluster.example_original.lower(), cluster.count)
+                for cluster in grammar_clusters
+            ],
+            "recent_corrections": recent_corrections,
+            "improvement_suggestions": generate_suggestions(corrections, archived_counts)
         }
 
     except Exception as e:
@@ -119,6 +138,48 @@ async def get_user_weaknesses(user_id: str):
         raise HTTPException(status_code=500, detail="Failed to analyze weaknesses")
 
 
+@router.get("/{user_id}/ranking")
+async def get_user_ranking(user_id: str, cohort: Optional[str] = None):
+    """Get user's percentile rankings within their cohort (or a given one)"""
+    if cohort and cohort not in COHORTS + [ALL_COHORT]:
+        raise HTTPException(status_code=400, detail=f"Unknown cohort: {cohort}")
+
+    try:
+        progress = await find_progress(user_id)
+
+        if not progress:
+            raise HTTPException(status_code=404, detail="Progress not found")
+
+        return {
+            "user_id": user_id,
+            **cohort_stats.ranking(progress, cohort)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error getting ranking: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get ranking")
+
+
+@router.get("/{user_id}/mistake-clusters")
+async def get_mistake_clusters(user_id: str, limit: int = 10, correction_type: Optional[str] = None):
+    """Get user's recurring mistakes grouped by similarity"""
+    try:
+        clusters = await mistake_cluster_engine.top_clusters(
+            user_id, limit=limit, correction_type=correction_type
+        )
+
+        return {
+            "user_id": user_id,
+            "clusters": [cluster.to_dict() for cluster in clusters]
+        }
+
+    except Exception as e:
+        print(f"Error clustering mistakes: {e}")
+        raise HTTPException(status_code=500, detail="Failed to cluster mistakes")
+
+
 async def get_total_conversations(user_id: str) -> int:
     """Get total number of conversations for user"""
     try:
@@ -135,22 +196,25 @@ async def get_total_conversations(user_id: str) -> int:
             where={"sessionId": {"in": session_ids}}
         )
 
-        return len(conversations)
+        archived_counts = await get_archived_counts(user_id)
+
+        return len(conversations) + archived_counts["conversations"]
 
     except Exception as e:
         print(f"Error counting conversations: {e}")
         return 0
 
 
-def generate_suggestions(corrections: list) -> list:
+def generate_suggestions(corrections: list, archived_counts: Optional[dict] = None) -> list:
     """Generate improvement suggestions based on correction patterns"""
     suggestions = []
+    archived_counts = archived_counts or {}
 
-    grammar_count = sum(1 for c in corrections if c.correctionType == "grammar")
-    pronunciation_count = sum(1 for c in corrections if c.correctionType == "pronunciation")
-    vocabulary_count = sum(1 for c in corrections if c.correctionType == "vocabulary")
+    grammar_count = sum(1 for c in corrections if c.correctionType == "grammar") + archived_counts.get("grammar", 0)
+    pronunciation_count = sum(1 for c in corrections if c.correctionType == "pronunciation") + archived_counts.get("pronunciation", 0)
+    vocabulary_count = sum(1 for c in corrections if c.correctionType == "vocabulary") + archived_counts.get("vocabulary", 0)
 
-    total = len(corrections)
+    total = len(corrections) + archived_counts.get("corrections", 0)
 
     if total == 0:
         return ["계속 연습하면서 실력을 키워보세요!"]
@@ -1,16 +1,37 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from app.models import UserCreate, UserResponse
 from app.database import get_db
+from app.services.archive import rehydrate_sessions
+from app.services.idempotency import idempotent
+from app.services.cache import user_cache, progress_cache
+from app.services.cohort_stats import cohort_stats
+from app.services.rate_limit import client_ip
 from passlib.context import CryptContext
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 @router.post("/", response_model=UserResponse)
-async def create_user(user: UserCreate):
+async def create_user(
+    user: UserCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create a new user"""
+    return await idempotent(
+        "create-user",
+        lambda: _create_user(user),
+        caller=f"ip:{client_ip(request.scope)}",
+        idempotency_key=idempotency_key,
+        coalesce_key=user.email.lower(),
+        payload=user
+    )
+
+
+async def _create_user(user: UserCreate):
     try:
         db = get_db()
 
@@ -35,12 +56,16 @@ async def create_user(user: UserCreate):
         )
 
         # Create initial progress record
-        await db.progress.create(
+        progress = await db.progress.create(
             data={
                 "userId": new_user.id
             }
         )
 
+        user_cache.set(new_user.id, new_user)
+        progress_cache.set(new_user.id, progress)
+        cohort_stats.observe(progress)
+
         return new_user
 
     except HTTPException:
@@ -55,8 +80,9 @@ async def get_user(user_id: str):
     """Get user by ID"""
     try:
         db = get_db()
-        user = await db.user.find_unique(
-            where={"id": user_id}
+        user = await user_cache.get_or_load(
+            user_id,
+            lambda: db.user.find_unique(where={"id": user_id})
         )
 
         if not user:
@@ -87,7 +113,7 @@ async def get_user_sessions(user_id: str, limit: int = 10):
             }
         )
 
-        return sessions
+        return await rehydrate_sessions(sessions)
 
     except Exception as e:
         print(f"Error getting sessions: {e}")
@@ -0,0 +1,218 @@
+"""
+Hot/cold archival of session transcripts
+
+Conversations and corrections of sessions that ended more than
+ARCHIVE_AFTER_DAYS ago are moved into a single zlib-compressed row in
+`session_archives`, and the original rows are deleted. Per-type counts are
+kept on the archive row so aggregates stay cheap, and archived content is
+rehydrated transparently when a session is read.
+"""
+import asyncio
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from prisma.fields import Base64
+from prisma.models import Conversation, Correction
+
+from app.config import get_settings
+from app.database import get_db
+from app.services.cache import session_cache
+
+settings = get_settings()
+
+
+def compress_transcript(conversations: list, corrections: list) -> Base64:
+    payload = {
+        "conversations": [c.model_dump(mode="json", exclude={"session", "corrections"}) for c in conversations],
+        "corrections": [c.model_dump(mode="json", exclude={"session", "conversation"}) for c in corrections],
+    }
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Base64.encode(zlib.compress(raw, level=9))
+
+
+def decompress_transcript(payload: Base64) -> dict:
+    raw = zlib.decompress(payload.decode())
+    data = json.loads(raw.decode("utf-8"))
+    return {
+        "conversations": [Conversation.model_validate(c) for c in data.get("conversations", [])],
+        "corrections": [Correction.model_validate(c) for c in data.get("corrections", [])],
+    }
+
+
+async def archive_session(session_id: str) -> bool:
+    """Move one session's transcript to cold storage. Returns True if archived."""
+    db = get_db()
+
+    session = await db.session.find_unique(
+        where={"id": session_id},
+        include={"conversations": True, "corrections": True}
+    )
+
+    if not session or session.archivedAt:
+        return False
+
+    conversations = session.conversations or []
+    corrections = session.corrections or []
+
+    async with db.tx() as tx:
+        await tx.sessionarchive.create(
+            data={
+                "sessionId": session_id,
+                "payload": compress_transcript(conversations, corrections),
+                "conversationCount": len(conversations),
+                "correctionCount": len(corrections),
+                "grammarCount": sum(1 for c in corrections if c.correctionType == "grammar"),
+                "pronunciationCount": sum(1 for c in corrections if c.correctionType == "pronunciation"),
+                "vocabularyCount": sum(1 for c in corrections if c.correctionType == "vocabulary"),
+            }
+        )
+        await tx.session.update(
+            where={"id": session_id},
+            data={"archivedAt": datetime.now()}
+        )
+        await tx.correction.delete_many(where={"sessionId": session_id})
+        await tx.conversation.delete_many(where={"sessionId": session_id})
+
+    session_cache.invalidate(session_id)
+    return True
+
+
+async def archive_old_sessions(
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Archive a batch of ended sessions older than the configured age"""
+    db = get_db()
+    days = older_than_days if older_than_days is not None else settings.ARCHIVE_AFTER_DAYS
+    cutoff = datetime.now() - timedelta(days=days)
+
+    sessions = await db.session.find_many(
+        where={
+            "archivedAt": None,
+            "endedAt": {"lt": cutoff}
+        },
+        order={"endedAt": "asc"},
+        take=batch_size or settings.ARCHIVE_BATCH_SIZE,
+        select={"id": True}
+    )
+
+    archived = 0
+    for session in sessions:
+        try:
+            if await archive_session(session.id):
+                archived += 1
+        except Exception as e:
+            print(f"Error archiving session {session.id}: {e}")
+
+    return archived
+
+
+async def run_archiver():
+    """Background loop that periodically archives old sessions"""
+    interval = settings.ARCHIVE_INTERVAL_MINUTES * 60
+    while True:
+        try:
+            while True:
+                archived = await archive_old_sessions()
+                if archived:
+                    print(f"Archived {archived} sessions")
+                if archived < settings.ARCHIVE_BATCH_SIZE:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error running archiver: {e}")
+
+        await asyncio.sleep(interval)
+
+
+async def load_archives(session_ids: List[str]) -> Dict[str, dict]:
+    """Load and decompress archives for the given sessions"""
+    if not session_ids:
+        return {}
+
+    db = get_db()
+    archives = await db.sessionarchive.find_many(
+        where={"sessionId": {"in": session_ids}}
+    )
+
+    return {a.sessionId: decompress_transcript(a.payload) for a in archives}
+
+
+async def rehydrate_sessions(sessions: list) -> list:
+    """Fill in conversations/corrections of archived sessions"""
+    archived_ids = [s.id for s in sessions if s.archivedAt]
+    if not archived_ids:
+        return sessions
+
+    transcripts = await load_archives(archived_ids)
+
+    result = []
+    for session in sessions:
+        transcript = transcripts.get(session.id)
+        if transcript is None:
+            result.append(session)
+            continue
+
+        update = {}
+        if session.conversations is not None:
+            update["conversations"] = transcript["conversations"]
+        if session.corrections is not None:
+            update["corrections"] = transcript["corrections"]
+        result.append(session.model_copy(update=update))
+
+    return result
+
+
+async def rehydrate_session(session):
+    """Single-session variant of rehydrate_sessions"""
+    if session is None or not session.archivedAt:
+        return session
+    return (await rehydrate_sessions([session]))[0]
+
+
+async def load_archived_corrections(user_id: str, max_sessions: Optional[int] = None) -> list:
+    """Corrections from a user's archived sessions, newest first"""
+    db = get_db()
+
+    kwargs = {
+        "where": {"userId": user_id, "archivedAt": {"not": None}},
+        "order": {"startedAt": "desc"},
+        "select": {"id": True}
+    }
+    if max_sessions:
+        kwargs["take"] = max_sessions
+    sessions = await db.session.find_many(**kwargs)
+
+    transcripts = await load_archives([s.id for s in sessions])
+
+    corrections = [c for t in transcripts.values() for c in t["corrections"]]
+    corrections.sort(key=lambda c: c.createdAt, reverse=True)
+    return corrections
+
+
+async def get_archived_counts(user_id: str) -> dict:
+    """Summary counts of a user's archived sessions"""
+    db = get_db()
+
+    # payload는 읽지 않고 카운트만 조회
+    archives = await db.sessionarchive.find_many(
+        where={"session": {"is": {"userId": user_id}}},
+        select={
+            "conversationCount": True,
+            "correctionCount": True,
+            "grammarCount": True,
+            "pronunciationCount": True,
+            "vocabularyCount": True
+        }
+    )
+
+    return {
+        "conversations": sum(a.conversationCount for a in archives),
+        "corrections": sum(a.correctionCount for a in archives),
+        "grammar": sum(a.grammarCount for a in archives),
+        "pronunciation": sum(a.pronunciationCount for a in archives),
+        "vocabulary": sum(a.vocabularyCount for a in archives),
+    }
@@ -0,0 +1,155 @@
+"""
+In-process read-through cache for hot entities
+
+TTLCache is an LRU with per-entry expiry. Missing rows (None) are cached
+for a shorter negative TTL, concurrent loads of the same key share one DB
+call, and hit/miss counters are exposed via /metrics.
+
+Caches are per process: write paths invalidate explicitly, and the TTL
+bounds staleness across workers.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 10000,
+        ttl: float = 60.0,
+        negative_ttl: Optional[float] = 15.0,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expires_at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.invalidations = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl is None:
+            # negative 캐시를 쓰지 않는 캐시
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self.invalidations += 1
+        self._entries.pop(key, None)
+        # 진행 중인 로드 결과가 캐시에 저장되지 않도록 분리
+        self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value or load it.
+
+        None results are negatively cached (unless negative_ttl is None);
+        other results are cached unless should_cache returns False for them.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            if value is None:
+                self.negative_hits += 1
+            return value
+
+        self.misses += 1
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()
+            raise
+
+        # 로드 중에 invalidate되지 않은 경우에만 저장
+        if self._loading.get(key) is future:
+            del self._loading[key]
+            if value is None or should_cache is None or should_cache(value):
+                self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _make_cache(name: str, negative: bool = True, max_entries: Optional[int] = None) -> TTLCache:
+    return TTLCache(
+        name,
+        max_entries=max_entries or settings.CACHE_MAX_ENTRIES,
+        ttl=settings.CACHE_TTL_SECONDS,
+        negative_ttl=settings.CACHE_NEGATIVE_TTL_SECONDS if negative else None,
+    )
+
+
+# user id -> User
+user_cache = _make_cache("user")
+# user id -> Progress
+# get_user_progress는 없는 행을 생성하므로 None을 캐시하면 안 됨
+progress_cache = _make_cache("progress", negative=False)
+# session id -> ended Session with conversations/corrections (immutable once ended).
+# Entries hold whole transcripts, so this cache gets its own small limit
+session_cache = _make_cache("session", max_entries=settings.SESSION_CACHE_MAX_ENTRIES)
+
+
+def cache_stats() -> dict:
+    return {c.name: c.stats() for c in (user_cache, progress_cache, session_cache)}
@@ -0,0 +1,190 @@
+"""
+Cohort percentile rankings
+
+Keeps a fixed-bucket histogram per (cohort, metric) so "better than X% of
+intermediate learners" is answered from a constant number of buckets,
+independent of how many users exist.
+
+Histograms are built once from the progress table at startup (and rebuilt
+periodically so multiple workers converge), then updated incrementally
+whenever a user's progress changes via observe().
+"""
+import asyncio
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.database import get_db
+
+settings = get_settings()
+
+# 누적 세션 수 기준 학습자 그룹 (User/Progress에 레벨 필드가 없으므로)
+COHORTS = ["beginner", "intermediate", "advanced"]
+ALL_COHORT = "all"
+INTERMEDIATE_MIN_SESSIONS = 10
+ADVANCED_MIN_SESSIONS = 50
+
+REBUILD_PAGE_SIZE = 1000
+
+
+def _log_edges(max_value: int) -> List[float]:
+    """0, 1, 2, ... then roughly 10% steps up to max_value"""
+    edges = [0.0]
+    value = 1.0
+    while value < max_value:
+        edges.append(float(int(value)))
+        value = max(value + 1, value * 1.1)
+    edges.append(float(max_value))
+    return sorted(set(edges))
+
+
+# metric -> (progress field, bucket lower edges)
+METRICS: Dict[str, Tuple[str, List[float]]] = {
+    "total_duration": ("totalDuration", _log_edges(1_000_000)),
+    "total_sessions": ("totalSessions", _log_edges(10_000)),
+    "grammar_score": ("grammarScore", [float(i) for i in range(101)]),
+    "pronunciation_score": ("pronunciationScore", [float(i) for i in range(101)]),
+    "vocabulary_score": ("vocabularyScore", [float(i) for i in range(101)]),
+}
+
+
+def cohort_for(progress) -> str:
+    if progress.totalSessions >= ADVANCED_MIN_SESSIONS:
+        return "advanced"
+    if progress.totalSessions >= INTERMEDIATE_MIN_SESSIONS:
+        return "intermediate"
+    return "beginner"
+
+
+class Histogram:
+    def __init__(self, edges: List[float]):
+        self.edges = edges
+        self.counts = [0] * len(edges)
+        self.total = 0
+
+    def bucket(self, value: float) -> int:
+        return max(0, bisect.bisect_right(self.edges, value) - 1)
+
+    def add(self, bucket: int, delta: int = 1) -> None:
+        self.counts[bucket] += delta
+        self.total += delta
+
+    def percentile(self, bucket: int, includes_self: bool = True) -> float:
+        """Share of the other learners strictly below this bucket, plus half of ties"""
+        others = self.total - (1 if includes_self else 0)
+        if others <= 0:
+            return 0.0
+        below = sum(self.counts[:bucket])
+        ties = self.counts[bucket] - (1 if includes_self else 0)
+        return 100.0 * (below + 0.5 * max(0, ties)) / others
+
+
+class CohortStats:
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        # user id -> (cohort, {metric: bucket}) - 이전 값을 빼기 위해 보관
+        self._users: Dict[str, Tuple[str, Dict[str, int]]] = {}
+        # 재구축 중 들어온 변경 사항 (재구축 결과에 다시 적용)
+        self._pending: Optional[Dict[str, object]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._histograms = {
+            (cohort, metric): Histogram(edges)
+            for cohort in COHORTS + [ALL_COHORT]
+            for metric, (_, edges) in METRICS.items()
+        }
+        self._users = {}
+
+    def _buckets(self, progress) -> Dict[str, int]:
+        buckets = {}
+        for metric, (field, _) in METRICS.items():
+            value = getattr(progress, field) or 0
+            buckets[metric] = self._histograms[(ALL_COHORT, metric)].bucket(value)
+        return buckets
+
+    def _apply(self, cohort: str, buckets: Dict[str, int], delta: int) -> None:
+        for metric, bucket in buckets.items():
+            self._histograms[(cohort, metric)].add(bucket, delta)
+            self._histograms[(ALL_COHORT, metric)].add(bucket, delta)
+
+    def observe(self, progress) -> None:
+        """Record a user's current progress, replacing their previous values"""
+        if progress is None:
+            return
+
+        if self._pending is not None:
+            self._pending[progress.userId] = progress
+
+        previous = self._users.get(progress.userId)
+        if previous is not None:
+            self._apply(previous[0], previous[1], -1)
+
+        cohort = cohort_for(progress)
+        buckets = self._buckets(progress)
+        self._apply(cohort, buckets, 1)
+        self._users[progress.userId] = (cohort, buckets)
+
+    async def rebuild(self) -> None:
+        """Rebuild all histograms from the progress table"""
+        db = get_db()
+        fresh = CohortStats()
+        self._pending = {}
+
+        try:
+            cursor: Optional[str] = None
+            while True:
+                kwargs = {"take": REBUILD_PAGE_SIZE, "order": {"id": "asc"}}
+                if cursor:
+                    kwargs.update(skip=1, cursor={"id": cursor})
+                page = await db.progress.find_many(**kwargs)
+
+                for progress in page:
+                    fresh.observe(progress)
+                if len(page) < REBUILD_PAGE_SIZE:
+                    break
+                cursor = page[-1].id
+
+            for progress in self._pending.values():
+                fresh.observe(progress)
+        finally:
+            self._pending = None
+
+        self._histograms = fresh._histograms
+        self._users = fresh._users
+
+    def ranking(self, progress, cohort: Optional[str] = None) -> dict:
+        """Percentiles of a user within a cohort (defaults to their own)"""
+        # 읽기 전용: 캐시된 progress가 오래됐을 수 있으므로 기록된 값을 우선 사용
+        if progress.userId not in self._users:
+            self.observe(progress)
+        own_cohort, buckets = self._users[progress.userId]
+        cohort = cohort or own_cohort
+        includes_self = cohort in (own_cohort, ALL_COHORT)
+
+        percentiles = {}
+        for metric, bucket in buckets.items():
+            histogram = self._histograms[(cohort, metric)]
+            percentiles[metric] = round(histogram.percentile(bucket, includes_self), 1)
+
+        return {
+            "cohort": cohort,
+            "cohort_size": self._histograms[(cohort, "total_sessions")].total,
+            "percentiles": percentiles,
+        }
+
+
+cohort_stats = CohortStats()
+
+
+async def run_cohort_rebuilder():
+    """Build histograms at startup and rebuild them periodically"""
+    while True:
+        try:
+            await cohort_stats.rebuild()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error rebuilding cohort stats: {e}")
+
+        await asyncio.sleep(settings.COHORT_REBUILD_MINUTES * 60)
@@ -0,0 +1,176 @@
+"""
+Idempotency keys and single-flight request coalescing
+
+Requests that share a key run the underlying operation once: concurrent
+callers await the same in-flight future, and callers arriving within the
+key's TTL get the stored result. Failed operations are not cached so the
+client can retry.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class _Entry:
+    future: asyncio.Future
+    fingerprint: Optional[str]
+    expires_at: float
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a request body, used to detect key reuse with a different payload"""
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump(mode="json")
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class SingleFlight:
+    """In-memory idempotency store with bounded size"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def _purge(self, now: float) -> None:
+        # 만료된 항목 정리 (완료된 항목만 제거, 진행 중인 요청은 유지)
+        expired = [
+            k for k, e in self._entries.items()
+            if e.expires_at <= now and e.future.done()
+        ]
+        for k in expired:
+            del self._entries[k]
+
+        while len(self._entries) > self.max_entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if not oldest.future.done():
+                break
+            del self._entries[oldest_key]
+
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        ttl: float,
+        request_fingerprint: Optional[str] = None,
+        reject_mismatch: bool = True,
+    ) -> Any:
+        """
+        Run func once per key.
+
+        When the stored fingerprint differs from request_fingerprint the
+        request is rejected with 422 (reject_mismatch) or run on its own
+        without sharing a result.
+        """
+        now = time.monotonic()
+        self._purge(now)
+
+        entry = self._entries.get(key)
+        if entry is not None and (entry.expires_at > now or not entry.future.done()):
+            if (
+                request_fingerprint
+                and entry.fingerprint
+                and request_fingerprint != entry.fingerprint
+            ):
+                if not reject_mismatch:
+                    # 다른 내용의 요청은 병합하지 않고 그대로 처리
+                    return await func()
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request body"
+                )
+            # shield: 한 호출자가 취소돼도 공유 작업은 계속 진행
+            return await asyncio.shield(entry.future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = _Entry(
+            future=future,
+            fingerprint=request_fingerprint,
+            expires_at=now + ttl,
+        )
+
+        try:
+            result = await func()
+        except BaseException as e:
+            # 실패한 결과는 캐시하지 않음 - 재시도 허용
+            self._entries.pop(key, None)
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # 대기자가 없을 때 "exception was never retrieved" 경고 방지
+                    future.exception()
+            raise
+
+        future.set_result(result)
+        # TTL은 작업이 끝난 시점부터 계산
+        self._entries[key].expires_at = time.monotonic() + ttl
+        return result
+
+    def discard(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop stored results matching predicate (e.g. a resource that was deleted)"""
+        stale = [
+            k for k, e in self._entries.items()
+            if e.future.done()
+            and not e.future.cancelled()
+            and e.future.exception() is None
+            and predicate(e.future.result())
+        ]
+        for k in stale:
+            del self._entries[k]
+        return len(stale)
+
+
+single_flight = SingleFlight()
+
+
+async def idempotent(
+    scope: str,
+    func: Callable[[], Awaitable[Any]],
+    caller: str,
+    idempotency_key: Optional[str] = None,
+    coalesce_key: Optional[str] = None,
+    payload: Any = None,
+) -> Any:
+    """
+    Run func at most once per key.
+
+    With an explicit Idempotency-Key the result is kept for
+    IDEMPOTENCY_KEY_TTL_SECONDS, namespaced by caller (user id, or client IP
+    when there is none) so another client reusing the key never receives
+    this caller's result. Without one, requests sharing coalesce_key
+    (e.g. the user id) are merged for COALESCE_WINDOW_SECONDS, but only
+    when their bodies match; a different body runs the handler normally.
+    """
+    request_fingerprint = fingerprint(payload) if payload is not None else None
+
+    if idempotency_key:
+        return await single_flight.run(
+            f"{scope}:key:{caller}:{idempotency_key}",
+            func,
+            ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+            request_fingerprint=request_fingerprint,
+        )
+
+    if coalesce_key and settings.COALESCE_WINDOW_SECONDS > 0:
+        return await single_flight.run(
+            f"{scope}:coalesce:{coalesce_key}",
+            func,
+            ttl=settings.COALESCE_WINDOW_SECONDS,
+            request_fingerprint=request_fingerprint,
+            reject_mismatch=False,
+        )
+
+    return await func()
@@ -0,0 +1,311 @@
+"""
+Mistake clustering engine
+
+Groups a learner's corrections into clusters of "the same mistake" even when
+the surrounding sentence differs, e.g. "I goed there" and "yesterday I goed"
+both reduce to the edit "goed -> went".
+
+Each correction pair is normalized into the edit that was made (removed and
+inserted tokens) and turned into a MinHash signature. Signatures are indexed
+with LSH bands so that a new correction only has to be compared against a
+handful of candidate clusters, which keeps updates O(1) per correction even for
+learners with thousands of corrections.
+
+Indexes are updated incrementally on read: each lookup pulls only the
+corrections created since the index's createdAt watermark.
+"""
+import asyncio
+import difflib
+import heapq
+import re
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.database import get_db
+from app.services.archive import load_archived_corrections
+
+# MinHash / LSH parameters (NUM_PERM = BANDS * ROWS)
+NUM_PERM = 32
+BANDS = 8
+ROWS = 4
+SIMILARITY_THRESHOLD = 0.5
+
+# 메모리 보호: 동시에 유지하는 사용자 인덱스 수
+MAX_CACHED_USERS = 1000
+# DB에서 한 번에 가져오는 교정 수
+FETCH_BATCH_SIZE = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _make_permutations(n: int) -> List[Tuple[int, int]]:
+    """Deterministic (a, b) coefficients for the universal hash family"""
+    perms = []
+    seed = 0x9E3779B97F4A7C15
+    for _ in range(n):
+        seed = (seed * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+        a = (seed >> 3) % _MERSENNE_PRIME or 1
+        seed = (seed * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+        b = (seed >> 3) % _MERSENNE_PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMUTATIONS = _make_permutations(NUM_PERM)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into word tokens, dropping punctuation"""
+    return _WORD_RE.findall((text or "").lower())
+
+
+def normalize_pair(original_text: str, corrected_text: str) -> Tuple[str, str]:
+    """
+    Reduce a correction pair to the part that actually changed.
+
+    Returns (removed, inserted) token strings. Falls back to the full
+    sentences when the correction rewrote everything.
+    """
+    original = tokenize(original_text)
+    corrected = tokenize(corrected_text)
+
+    removed: List[str] = []
+    inserted: List[str] = []
+    matcher = difflib.SequenceMatcher(a=original, b=corrected, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed.extend(original[i1:i2])
+        inserted.extend(corrected[j1:j2])
+
+    if not removed and not inserted:
+        return " ".join(original), " ".join(corrected)
+
+    return " ".join(removed), " ".join(inserted)
+
+
+def shingles(removed: str, inserted: str) -> Set[str]:
+    """Word and character n-gram features of a normalized edit"""
+    features: Set[str] = set()
+
+    for prefix, text in (("-", removed), ("+", inserted)):
+        words = text.split()
+        for word in words:
+            features.add(f"{prefix}w:{word}")
+        for a, b in zip(words, words[1:]):
+            features.add(f"{prefix}b:{a} {b}")
+        padded = f" {text} "
+        for i in range(len(padded) - 2):
+            features.add(f"{prefix}c:{padded[i:i + 3]}")
+
+    # 교정 전후 쌍 자체도 하나의 강한 특징으로 사용
+    features.add(f"pair:{removed}->{inserted}")
+    return features
+
+
+def minhash(features: Set[str]) -> Tuple[int, ...]:
+    """Compute the MinHash signature of a feature set"""
+    if not features:
+        return tuple([_MAX_HASH] * NUM_PERM)
+
+    hashed = [zlib.crc32(f.encode("utf-8")) for f in features]
+    signature = []
+    for a, b in _PERMUTATIONS:
+        signature.append(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed))
+    return tuple(signature)
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return matches / NUM_PERM
+
+
+def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+@dataclass
+class MistakeCluster:
+    id: int
+    correction_type: str
+    signature: Tuple[int, ...]
+    removed: str
+    inserted: str
+    example_original: str
+    example_corrected: str
+    count: int = 0
+    last_seen: Optional[datetime] = None
+    correction_ids: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "cluster_id": self.id,
+            "correction_type": self.correction_type,
+            "pattern": f"{self.removed} → {self.inserted}".strip(),
+            "example_original": self.example_original,
+            "example_corrected": self.example_corrected,
+            "count": self.count,
+            "last_seen": self.last_seen,
+        }
+
+
+class UserMistakeIndex:
+    """Incremental MinHash/LSH index of one user's corrections"""
+
+    # 클러스터마다 보관하는 최근 교정 id 수
+    MAX_IDS_PER_CLUSTER = 20
+
+    def __init__(self):
+        self.clusters: Dict[int, MistakeCluster] = {}
+        self.buckets: Dict[Tuple[str, int, Tuple[int, ...]], List[int]] = {}
+        self.seen_ids: Set[str] = set()
+        self.watermark: Optional[datetime] = None
+        self.hydrated = False
+        self.lock = asyncio.Lock()
+        self._next_id = 1
+
+    def add(
+        self,
+        correction_id: str,
+        correction_type: str,
+        original_text: str,
+        corrected_text: str,
+        created_at: Optional[datetime] = None,
+        track_watermark: bool = True,
+    ) -> Optional[MistakeCluster]:
+        """Add a single correction, returning the cluster it was assigned to"""
+        if correction_id in self.seen_ids:
+            return None
+        self.seen_ids.add(correction_id)
+
+        if track_watermark and created_at and (self.watermark is None or created_at > self.watermark):
+            self.watermark = created_at
+
+        removed, inserted = normalize_pair(original_text, corrected_text)
+        signature = minhash(shingles(removed, inserted))
+        band_keys = [(correction_type, band, rows) for band, rows in _band_keys(signature)]
+
+        # LSH 후보 클러스터 중 가장 유사한 것 선택
+        best: Optional[MistakeCluster] = None
+        best_score = 0.0
+        candidates: Set[int] = set()
+        for key in band_keys:
+            candidates.update(self.buckets.get(key, ()))
+        for cluster_id in candidates:
+            cluster = self.clusters[cluster_id]
+            score = estimate_similarity(signature, cluster.signature)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        if best is None or best_score < SIMILARITY_THRESHOLD:
+            best = MistakeCluster(
+                id=self._next_id,
+                correction_type=correction_type,
+                signature=signature,
+                removed=removed,
+                inserted=inserted,
+                example_original=original_text,
+                example_corrected=corrected_text,
+            )
+            self.clusters[best.id] = best
+            self._next_id += 1
+            for key in band_keys:
+                self.buckets.setdefault(key, []).append(best.id)
+
+        best.count += 1
+        if created_at and (best.last_seen is None or created_at > best.last_seen):
+            best.last_seen = created_at
+        best.correction_ids.append(correction_id)
+        if len(best.correction_ids) > self.MAX_IDS_PER_CLUSTER:
+            del best.correction_ids[0]
+
+        return best
+
+    def top(self, limit: int = 5, correction_type: Optional[str] = None) -> List[MistakeCluster]:
+        """Most frequent clusters, most recent first on ties"""
+        clusters = self.clusters.values()
+        if correction_type:
+            clusters = [c for c in clusters if c.correction_type == correction_type]
+        return heapq.nlargest(
+            limit,
+            clusters,
+            key=lambda c: (c.count, c.last_seen or datetime.min),
+        )
+
+
+class MistakeClusterEngine:
+    """Keeps per-user mistake indexes in memory and syncs them from the DB"""
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, UserMistakeIndex]" = OrderedDict()
+
+    def _get_index(self, user_id: str) -> UserMistakeIndex:
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = UserMistakeIndex()
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(user_id)
+        return index
+
+    async def sync(self, user_id: str) -> UserMistakeIndex:
+        """Pull corrections created since the last sync into the index"""
+        index = self._get_index(user_id)
+
+        async with index.lock:
+            db = get_db()
+            while True:
+                where = {"session": {"is": {"userId": user_id}}}
+                if index.watermark is not None:
+                    where["createdAt"] = {"gte": index.watermark}
+
+                corrections = await db.correction.find_many(
+                    where=where,
+                    order={"createdAt": "asc"},
+                    take=FETCH_BATCH_SIZE,
+                )
+
+                new_count = 0
+                for c in corrections:
+                    if c.id in index.seen_ids:
+                        continue
+                    index.add(c.id, c.correctionType, c.originalText, c.correctedText, c.createdAt)
+                    new_count += 1
+
+                # 같은 createdAt 경계 때문에 gte로 가져오므로, 새 항목이 없으면 종료
+                if len(corrections) < FETCH_BATCH_SIZE or new_count == 0:
+                    break
+
+            if not index.hydrated:
+                # 보관된 세션의 교정도 포함 (라이브 조회 이후에 읽어 보관 중 누락 방지).
+                # 라이브 테이블 기준 watermark는 바꾸지 않음
+                for c in reversed(await load_archived_corrections(user_id)):
+                    index.add(
+                        c.id, c.correctionType, c.originalText, c.correctedText, c.createdAt,
+                        track_watermark=False
+                    )
+
+            index.hydrated = True
+
+        return index
+
+    async def top_clusters(
+        self,
+        user_id: str,
+        limit: int = 5,
+        correction_type: Optional[str] = None,
+    ) -> List[MistakeCluster]:
+        index = await self.sync(user_id)
+        return index.top(limit, correction_type)
+
+
+mistake_cluster_engine = MistakeClusterEngine()
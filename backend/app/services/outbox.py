@@ -0,0 +1,201 @@
+"""
+Transactional outbox
+
+Side effects (progress updates, rollups, ...) are written as rows in
+`outbox_events` inside the same transaction as the change that caused them,
+and a pool of background workers drains them in batches.
+
+Workers claim disjoint batches with `FOR UPDATE SKIP LOCKED`, pushing
+availableAt out by OUTBOX_LEASE_SECONDS so a crashed worker's events are
+picked up again once the lease expires. Each event is handled in its own
+transaction that also flips its status to "done", so DB side effects are
+applied exactly once even if a worker crashes mid-batch. Failed events are retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, then marked "failed". Processed events are purged
+after OUTBOX_RETENTION_HOURS so the table doesn't grow without bound.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from prisma import Json
+
+from app.config import get_settings
+from app.database import get_db
+
+settings = get_settings()
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# handler(tx, payload) - tx는 이벤트 상태 갱신과 같은 트랜잭션.
+# 콜백을 반환하면 커밋 후 호출됨 (캐시 무효화 등)
+Handler = Callable[[object, dict], Awaitable[Optional[Callable[[], None]]]]
+
+_handlers: Dict[str, Handler] = {}
+_wakeup = asyncio.Event()
+
+
+def handler(event_type: str):
+    """Register a handler for an outbox event type"""
+    def decorator(func: Handler) -> Handler:
+        _handlers[event_type] = func
+        return func
+    return decorator
+
+
+async def enqueue(client, event_type: str, payload: dict) -> None:
+    """Record an event using the given client (pass the transaction client)"""
+    await client.outboxevent.create(
+        data={
+            "eventType": event_type,
+            "payload": Json(payload)
+        }
+    )
+
+
+def notify() -> None:
+    """Wake idle workers after new events were committed"""
+    _wakeup.set()
+
+
+async def _process_event(event) -> None:
+    db = get_db()
+    func = _handlers.get(event.eventType)
+
+    try:
+        if func is None:
+            raise Exception(f"No handler registered for {event.eventType}")
+
+        async with db.tx() as tx:
+            # 임대가 만료돼 다른 워커가 이미 처리했으면 건너뜀 (행 잠금으로 직렬화됨)
+            claimed = await tx.outboxevent.update_many(
+                where={"id": event.id, "status": PENDING},
+                data={"status": DONE, "processedAt": datetime.now()}
+            )
+            if claimed == 0:
+                return
+            after_commit = await func(tx, event.payload)
+
+        if callable(after_commit):
+            after_commit()
+
+    except Exception as e:
+        attempts = event.attempts + 1
+        print(f"Error processing outbox event {event.id} ({event.eventType}): {e}")
+        await db.outboxevent.update_many(
+            where={"id": event.id, "status": PENDING},
+            data={
+                "attempts": attempts,
+                "lastError": str(e),
+                "status": FAILED if attempts >= settings.OUTBOX_MAX_ATTEMPTS else PENDING,
+                "availableAt": datetime.now() + timedelta(seconds=2 ** attempts)
+            }
+        )
+
+
+# 워커끼리 같은 행을 두고 경쟁하지 않도록 SKIP LOCKED로 배치를 원자적으로 선점.
+# availableAt을 임대 만료 시각으로 미뤄 두므로 워커가 죽어도 만료 후 다시 처리됨
+_CLAIM_SQL = """
+UPDATE "outbox_events"
+SET "available_at" = $1::timestamp
+WHERE "id" IN (
+    SELECT "id" FROM "outbox_events"
+    WHERE "status" = 'pending' AND "available_at" <= $2::timestamp
+    ORDER BY "available_at"
+    LIMIT $3
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING "id"
+"""
+
+
+async def claim_batch() -> list:
+    """Claim up to OUTBOX_BATCH_SIZE due events for this worker"""
+    db = get_db()
+    now = datetime.now()
+    lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+
+    rows = await db.query_raw(
+        _CLAIM_SQL,
+        lease_until.isoformat(),
+        now.isoformat(),
+        settings.OUTBOX_BATCH_SIZE
+    )
+    if not rows:
+        return []
+
+    return await db.outboxevent.find_many(
+        where={"id": {"in": [row["id"] for row in rows]}},
+        order={"createdAt": "asc"}
+    )
+
+
+async def process_batch() -> int:
+    """Handle one batch of due events, returning how many were picked up"""
+    events = await claim_batch()
+
+    for event in events:
+        await _process_event(event)
+
+    return len(events)
+
+
+async def purge_processed() -> int:
+    """Delete done events older than the retention period"""
+    db = get_db()
+    cutoff = datetime.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+
+    return await db.outboxevent.delete_many(
+        where={
+            "status": DONE,
+            "processedAt": {"lt": cutoff}
+        }
+    )
+
+
+async def _worker(worker_id: int) -> None:
+    last_purge = 0.0
+    while True:
+        # 정리는 첫 번째 워커만 수행
+        if worker_id == 0 and time.monotonic() - last_purge >= settings.OUTBOX_PURGE_INTERVAL_MINUTES * 60:
+            last_purge = time.monotonic()
+            try:
+                purged = await purge_processed()
+                if purged:
+                    print(f"Purged {purged} processed outbox events")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error purging outbox events: {e}")
+
+        try:
+            processed = await process_batch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Outbox worker {worker_id} error: {e}")
+            processed = 0
+
+        if processed:
+            continue
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start_workers() -> List[asyncio.Task]:
+    return [
+        asyncio.create_task(_worker(i))
+        for i in range(settings.OUTBOX_WORKERS)
+    ]
+
+
+async def stop_workers(tasks: List[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
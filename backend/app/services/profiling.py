@@ -0,0 +1,361 @@
+"""
+On-demand per-request profiling
+
+A request is profiled when it carries a valid signed `X-Profile-Token`
+header, or when an admin has armed profiling for its path. For that request
+only we:
+
+- sample the event loop thread's Python stack every PROFILE_SAMPLE_INTERVAL_MS
+- trace every Prisma call (model, action, time, row count)
+- flag N+1 patterns and oversized `include`s
+
+Tokens are signed with PROFILE_SIGNING_KEY (or ADMIN_TOKEN), never with
+the default SECRET_KEY. Reports are kept in memory and served by the admin
+router (requires ADMIN_TOKEN). Requests without the header skip straight to the app, so
+profiling costs nothing when off.
+"""
+import hashlib
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.database import db_wrapper
+
+settings = get_settings()
+
+PROFILE_HEADER = b"x-profile-token"
+
+# 같은 모델/액션/조건 형태가 이 횟수 이상 반복되면 N+1로 표시
+N_PLUS_ONE_THRESHOLD = 5
+# include로 함께 읽은 하위 행이 이 수를 넘으면 과도한 include로 표시
+OVERSIZED_INCLUDE_ROWS = 200
+MAX_STACK_DEPTH = 64
+MAX_REPORTS = 50
+
+
+# 공개된 기본값 - 이 값으로는 절대 서명하지 않음
+_DEFAULT_SECRET_KEY = "temp_secret_key_not_used"
+
+
+def signing_key() -> Optional[bytes]:
+    """Dedicated profiling key (or ADMIN_TOKEN); None if no safe key is configured"""
+    key = settings.PROFILE_SIGNING_KEY or settings.ADMIN_TOKEN
+    if not key or key == _DEFAULT_SECRET_KEY:
+        return None
+    return key.encode("utf-8")
+
+
+def sign_token(expires_at: int, key: bytes) -> str:
+    sig = hmac.new(
+        key,
+        f"profile:{expires_at}".encode("utf-8"),
+        hashlib.sha256
+    ).hexdigest()
+    return f"{expires_at}.{sig}"
+
+
+def create_token(ttl: Optional[int] = None) -> Optional[str]:
+    """Issue a signed token, or None when no safe signing key is configured"""
+    key = signing_key()
+    if key is None:
+        return None
+    return sign_token(int(time.time()) + (ttl or settings.PROFILE_TOKEN_TTL_SECONDS), key)
+
+
+def verify_token(token: str) -> bool:
+    key = signing_key()
+    if key is None:
+        return False
+    try:
+        expires_str, _ = token.split(".", 1)
+        expires_at = int(expires_str)
+    except ValueError:
+        return False
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(sign_token(expires_at, key), token)
+
+
+def _count_rows(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return 1
+
+
+def _include_rows(result, include: dict) -> int:
+    """Number of nested rows loaded through `include`"""
+    items = result if isinstance(result, list) else [result]
+    total = 0
+    for item in items:
+        for relation, enabled in include.items():
+            if not enabled:
+                continue
+            nested = getattr(item, relation, None)
+            if isinstance(nested, list):
+                total += len(nested)
+            elif nested is not None:
+                total += 1
+    return total
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.status_code: Optional[int] = None
+        self.queries: List[dict] = []
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    # --- stack sampling -------------------------------------------------
+
+    def _sample_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+
+    def start(self) -> None:
+        interval = settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self._sampler = threading.Thread(target=self._sample_loop, args=(interval,), daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=1)
+        self.duration_ms = (time.time() - self.started_at) * 1000
+
+    # --- query tracing --------------------------------------------------
+
+    def record_query(self, model: str, action: str, kwargs: dict, result, elapsed_ms: float) -> None:
+        where = kwargs.get("where")
+        include = kwargs.get("include")
+        self.queries.append({
+            "model": model,
+            "action": action,
+            "duration_ms": round(elapsed_ms, 2),
+            "rows": _count_rows(result),
+            "where_keys": sorted(where.keys()) if isinstance(where, dict) else [],
+            "include": sorted(k for k, v in include.items() if v) if isinstance(include, dict) else [],
+            "include_rows": _include_rows(result, include) if isinstance(include, dict) and result is not None else 0,
+            "take": kwargs.get("take"),
+        })
+
+    def warnings(self) -> List[dict]:
+        found = []
+
+        shapes = Counter(
+            (q["model"], q["action"], tuple(q["where_keys"])) for q in self.queries
+        )
+        for (model, action, where_keys), count in shapes.items():
+            if count >= N_PLUS_ONE_THRESHOLD:
+                found.append({
+                    "type": "n_plus_one",
+                    "detail": f"{model}.{action} where {list(where_keys)} ran {count} times"
+                })
+
+        for q in self.queries:
+            if q["include_rows"] > OVERSIZED_INCLUDE_ROWS:
+                found.append({
+                    "type": "oversized_include",
+                    "detail": f"{q['model']}.{q['action']} include {q['include']} loaded {q['include_rows']} rows"
+                })
+            elif q["include"] and q["action"] == "find_many" and q["take"] is None:
+                found.append({
+                    "type": "unbounded_include",
+                    "detail": f"{q['model']}.find_many include {q['include']} has no take"
+                })
+
+        return found
+
+    def report(self, top: int = 30) -> dict:
+        db_ms = sum(q["duration_ms"] for q in self.queries)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2),
+            "db_time_ms": round(db_ms, 2),
+            "db_query_count": len(self.queries),
+            "sample_count": self.sample_count,
+            "sample_interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+            # 이벤트 루프를 공유하므로 동시에 처리된 다른 요청의 스택이 섞일 수 있음
+            "top_stacks": [
+                {"stack": stack.split(";"), "samples": count}
+                for stack, count in self.samples.most_common(top)
+            ],
+            "queries": self.queries,
+            "warnings": self.warnings(),
+        }
+
+
+class _TracedActions:
+    def __init__(self, actions, model: str, profile: RequestProfile):
+        self._actions = actions
+        self._model = model
+        self._profile = profile
+
+    def __getattr__(self, name):
+        attr = getattr(self._actions, name)
+        if not callable(attr):
+            return attr
+
+        async def traced(*args, **kwargs):
+            start = time.perf_counter()
+            result = await attr(*args, **kwargs)
+            self._profile.record_query(
+                self._model, name, kwargs, result, (time.perf_counter() - start) * 1000
+            )
+            return result
+
+        return traced
+
+
+class _TracedTransaction:
+    def __init__(self, manager, profile: RequestProfile):
+        self._manager = manager
+        self._profile = profile
+
+    async def __aenter__(self):
+        client = await self._manager.__aenter__()
+        return _TracedClient(client, self._profile)
+
+    async def __aexit__(self, *exc_info):
+        return await self._manager.__aexit__(*exc_info)
+
+
+class _TracedClient:
+    """Prisma client proxy that records every model action"""
+
+    def __init__(self, client, profile: RequestProfile):
+        self._client = client
+        self._profile = profile
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name == "tx":
+            return lambda *args, **kwargs: _TracedTransaction(attr(*args, **kwargs), self._profile)
+        if hasattr(attr, "find_many"):
+            return _TracedActions(attr, name, self._profile)
+        return attr
+
+
+class ProfileStore:
+    def __init__(self, max_reports: int = MAX_REPORTS):
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[str, dict]" = OrderedDict()
+        # path prefix -> remaining number of requests to profile
+        self._armed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def arm(self, path_prefix: str, count: int = 1) -> None:
+        with self._lock:
+            self._armed[path_prefix] = count
+
+    def take_armed(self, path: str) -> bool:
+        if not self._armed:
+            return False
+        with self._lock:
+            for prefix, remaining in list(self._armed.items()):
+                if path.startswith(prefix):
+                    if remaining <= 1:
+                        del self._armed[prefix]
+                    else:
+                        self._armed[prefix] = remaining - 1
+                    return True
+        return False
+
+    def armed(self) -> Dict[str, int]:
+        return dict(self._armed)
+
+    def save(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._reports[profile.id] = profile.report()
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._reports.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [
+            {
+                "id": r["id"],
+                "method": r["method"],
+                "path": r["path"],
+                "duration_ms": r["duration_ms"],
+                "db_query_count": r["db_query_count"],
+                "warnings": len(r["warnings"]),
+            }
+            for r in reversed(self._reports.values())
+        ]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles only requests that opt in"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return verify_token(value.decode("latin-1"))
+        return profile_store.take_armed(scope["path"])
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.PROFILING_ENABLED
+            or not settings.ADMIN_TOKEN
+            or not self._should_profile(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = db_wrapper.set(lambda client: _TracedClient(client, profile))
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            db_wrapper.reset(token)
+            profile_store.save(profile)
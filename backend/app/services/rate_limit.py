@@ -0,0 +1,248 @@
+"""
+Token-bucket rate limiting
+
+RateLimitMiddleware matches requests against per-route rules and charges one
+token from a per-client bucket. Buckets are keyed by client IP only: user ids
+in the path are unauthenticated, so keying on them would let one client
+spread load over many ids or drain another learner's bucket.
+Buckets live in memory with O(1) checks and idle eviction; set
+RATE_LIMIT_REDIS_URL to share buckets between workers (requires `redis`).
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class RateLimitRule:
+    """`capacity` requests per `period` seconds, refilled continuously"""
+    name: str
+    method: str
+    path: str  # regex matched against the full path
+    capacity: int
+    period: float
+
+    def __post_init__(self):
+        self.pattern = re.compile(f"^{self.path}$")
+        self.rate = self.capacity / self.period
+
+
+# (allowed, retry_after seconds, remaining tokens)
+Decision = Tuple[bool, float, int]
+
+
+class MemoryBackend:
+    """In-process buckets; least recently used buckets are evicted when idle"""
+
+    def __init__(self, idle_seconds: float = 600.0, max_buckets: int = 100000):
+        self.idle_seconds = idle_seconds
+        self.max_buckets = max_buckets
+        # key -> [tokens, last_refill]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        # 가장 오래 사용되지 않은 버킷부터 확인하므로 amortized O(1)
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < self.idle_seconds and len(self._buckets) <= self.max_buckets:
+                break
+            del self._buckets[key]
+
+    async def hit(self, key: str, rule: RateLimitRule) -> Decision:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = [float(rule.capacity), now]
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.rate)
+            bucket[1] = now
+
+        self._evict(now)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0, int(bucket[0])
+
+        return False, (1 - bucket[0]) / rule.rate, 0
+
+
+# KEYS[1]=bucket, ARGV = capacity, rate, now(ms), ttl(ms)
+_REDIS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) / 1000 * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Shared buckets for multi-worker deployments; falls back to memory on errors"""
+
+    def __init__(self, url: str, fallback: MemoryBackend):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(_REDIS_SCRIPT)
+        self.fallback = fallback
+
+    async def hit(self, key: str, rule: RateLimitRule) -> Decision:
+        try:
+            allowed, tokens = await self.script(
+                keys=[f"ratelimit:{key}"],
+                args=[
+                    rule.capacity,
+                    rule.rate,
+                    int(time.time() * 1000),
+                    int(rule.period * 2000)
+                ]
+            )
+        except Exception as e:
+            print(f"Rate limit backend error, using in-memory buckets: {e}")
+            return await self.fallback.hit(key, rule)
+
+        tokens = float(tokens)
+        if allowed:
+            return True, 0.0, int(tokens)
+        return False, (1 - tokens) / rule.rate, 0
+
+
+def create_backend():
+    memory = MemoryBackend(idle_seconds=settings.RATE_LIMIT_IDLE_SECONDS)
+    if not settings.RATE_LIMIT_REDIS_URL:
+        return memory
+    try:
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL, memory)
+    except ImportError:
+        print("redis package not installed - using in-memory rate limiting")
+        return memory
+
+
+TRUSTED_PROXIES = {p.strip() for p in settings.TRUSTED_PROXIES.split(",") if p.strip()}
+
+_warned_unconfigured_proxy = False
+
+
+def _forwarded_for(scope) -> List[str]:
+    forwarded = []
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            forwarded.extend(p.strip() for p in value.decode("latin-1").split(","))
+    return [address for address in forwarded if address]
+
+
+def client_ip(scope) -> str:
+    """
+    Client address for rate limiting.
+
+    X-Forwarded-For is client-controlled, so only the entries appended by our
+    own proxies are used: with TRUSTED_PROXY_HOPS=n (the Docker image sets 1
+    for Railway) the n-th entry from the right is the client. Otherwise the
+    header is only honoured when the direct peer is in TRUSTED_PROXIES, and
+    the right-most entry not added by a trusted proxy is the client.
+    """
+    global _warned_unconfigured_proxy
+
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = _forwarded_for(scope)
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+        # 프록시를 거치지 않은 요청 - 헤더는 신뢰하지 않음
+        return peer
+
+    trusted = TRUSTED_PROXIES
+    if peer not in trusted:
+        if not trusted and not _warned_unconfigured_proxy and _forwarded_for(scope):
+            # 프록시 뒤에서 설정 없이 실행하면 모든 사용자가 하나의 버킷을 공유함
+            _warned_unconfigured_proxy = True
+            print(
+                "Rate limiting: X-Forwarded-For received but no proxy is configured - "
+                "set TRUSTED_PROXY_HOPS or TRUSTED_PROXIES, otherwise all clients share the proxy's bucket"
+            )
+        return peer
+
+    for address in reversed(_forwarded_for(scope)):
+        if address not in trusted:
+            return address
+
+    return peer
+
+
+class RateLimitMiddleware:
+    """ASGI middleware returning 429 with Retry-After when a bucket is empty"""
+
+    def __init__(self, app, rules: List[RateLimitRule], backend=None):
+        self.app = app
+        self.rules = rules
+        self.backend = backend or create_backend()
+
+    def _match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.method == method and rule.pattern.match(path):
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 경로의 user_id는 인증되지 않은 값이므로 클라이언트 IP로만 구분
+        allowed, retry_after, remaining = await self.backend.hit(f"{rule.name}:ip:{client_ip(scope)}", rule)
+
+        if not allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."},
+                headers={
+                    "Retry-After": str(max(1, math.ceil(retry_after))),
+                    "X-RateLimit-Limit": str(rule.capacity)
+                }
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+DEFAULT_RULES = [
+    RateLimitRule("avatar-create", "POST", r"/api/avatar-sessions/create", capacity=5, period=60),
+    RateLimitRule("progress-stats", "GET", r"/api/progress/[^/]+/stats", capacity=30, period=60),
+    RateLimitRule("progress-weaknesses", "GET", r"/api/progress/[^/]+/weaknesses", capacity=30, period=60),
+    RateLimitRule("mistake-clusters", "GET", r"/api/progress/[^/]+/mistake-clusters", capacity=30, period=60),
+]
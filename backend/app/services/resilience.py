@@ -0,0 +1,177 @@
+"""
+Resilience helpers for upstream HTTP calls
+
+- CircuitBreaker: fails fast once the recent error rate crosses a threshold
+- retry_with_jitter: bounded retries with full-jitter exponential backoff
+  (only use for idempotent operations)
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Tuple, Type
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is temporarily unavailable (circuit open)")
+
+
+class UpstreamError(Exception):
+    """An upstream failure that should count against the breaker"""
+
+    def __init__(self, status_code: int, detail: str = ""):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f"upstream returned {status_code}: {detail}")
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a sliding time window.
+
+    closed -> open when, within window_seconds, at least min_calls were made
+    and the failure ratio is >= error_rate. After cooldown_seconds one probe
+    call is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        error_rate: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+
+        # metrics
+        self.total_calls = 0
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown_seconds - time.monotonic())
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go upstream"""
+        now = time.monotonic()
+
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown_seconds:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.cooldown_seconds)
+            self._probe_in_flight = True
+
+    def record(self, success: bool) -> None:
+        now = time.monotonic()
+        self.total_calls += 1
+        if not success:
+            self.total_failures += 1
+
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if success:
+                self.state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, success))
+        self._trim(now)
+
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func through the breaker; UpstreamError and timeouts count as failures"""
+        self.before_call()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        self.record(True)
+        return result
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        self._trim(now)
+        window_failures = sum(1 for _, ok in self._outcomes if not ok)
+        return {
+            "state": self.state,
+            "retry_after": round(self.retry_after(), 1),
+            "window_calls": len(self._outcomes),
+            "window_failures": window_failures,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+async def retry_with_jitter(
+    func: Callable[[], Awaitable[Any]],
+    retries: int = 2,
+    base_delay: float = 0.2,
+    max_delay: float = 2.0,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+) -> Any:
+    """Retry func up to `retries` extra times with full-jitter backoff"""
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except CircuitOpenError:
+            raise
+        except retry_on:
+            if attempt >= retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            attempt += 1
+            await asyncio.sleep(delay)
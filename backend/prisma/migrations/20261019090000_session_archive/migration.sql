@@ -0,0 +1,23 @@
+-- AlterTable
+ALTER TABLE "sessions" ADD COLUMN     "archived_at" TIMESTAMP(3);
+
+-- CreateTable
+CREATE TABLE "session_archives" (
+    "id" TEXT NOT NULL,
+    "session_id" TEXT NOT NULL,
+    "payload" BYTEA NOT NULL,
+    "conversation_count" INTEGER NOT NULL DEFAULT 0,
+    "correction_count" INTEGER NOT NULL DEFAULT 0,
+    "grammar_count" INTEGER NOT NULL DEFAULT 0,
+    "pronunciation_count" INTEGER NOT NULL DEFAULT 0,
+    "vocabulary_count" INTEGER NOT NULL DEFAULT 0,
+    "archived_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "session_archives_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "session_archives_session_id_key" ON "session_archives"("session_id");
+
+-- AddForeignKey
+ALTER TABLE "session_archives" ADD CONSTRAINT "session_archives_session_id_fkey" FOREIGN KEY ("session_id") REFERENCES "sessions"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -105,7 +105,11 @@ export default function SimpleLearningPage() {
         {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({}),
+          // 중복 요청(더블 탭 등)이 하나의 Tavus 대화로 병합되도록 사용자/세션 정보 전달
+          body: JSON.stringify({
+            user_id: localStorage.getItem("test_user_id"),
+            session_id: sessionId,
+          }),
         }
       );
 